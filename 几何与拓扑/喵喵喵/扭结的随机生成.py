@@ -1,90 +1,96 @@
+import functools
+import io
 import random
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.path import Path
-import matplotlib.patches as patches
-import networkx as nx
-from scipy.spatial import Delaunay
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+import matplotlib.tri as mtri
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# 交叉处线段相对交叉点的偏移：上方的线段（实线）、下方的两段（断开）
+_STRAND_OFFSETS = np.array([[[-0.1, -0.1], [0.1, 0.1]],
+                            [[-0.1, 0.1], [-0.03, 0.03]],
+                            [[0.03, -0.03], [0.1, -0.1]]])
+
+def _knot_geometry_numpy(n):
+    """计算n个交叉点的圆形布局位置及交叉处线段"""
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    pos = np.stack([1.5 * np.cos(angles), 1.5 * np.sin(angles)], axis=1)
+    segs = pos[None, :, None, :] + _STRAND_OFFSETS[:, None, :, :]
+    return pos, segs.reshape(3 * n, 2, 2)
+
+def _knot_geometry_kernel(n):
+    """与 _knot_geometry_numpy 相同，逐点循环写法供numba编译"""
+    pos = np.empty((n, 2))
+    segs = np.empty((3 * n, 2, 2))
+    for i in range(n):
+        angle = 2 * np.pi * i / n
+        x = 1.5 * np.cos(angle)
+        y = 1.5 * np.sin(angle)
+        pos[i, 0] = x
+        pos[i, 1] = y
+        for k in range(3):
+            for j in range(2):
+                segs[k * n + i, j, 0] = x + _STRAND_OFFSETS[k, j, 0]
+                segs[k * n + i, j, 1] = y + _STRAND_OFFSETS[k, j, 1]
+    return pos, segs
+
+# numba在首次调用时才编译（约0.5秒），交叉点较少时NumPy只需几十微秒，
+# 因此只在规模很大时才使用编译版本
+_NUMBA_MIN_CROSSINGS = 100_000
+_knot_geometry_jit = njit(_knot_geometry_kernel) if njit is not None else None
+
+def _knot_geometry(n):
+    """计算布局，交叉点很多且有numba时使用编译版本"""
+    if _knot_geometry_jit is not None and n >= _NUMBA_MIN_CROSSINGS:
+        return _knot_geometry_jit(n)
+    return _knot_geometry_numpy(n)
 
 class Knot:
     def __init__(self, name, pd_code):
         self.name = name
         self.pd_code = pd_code
         self.crossings = len(pd_code)
-        self.graph = self.build_graph()
-        self.positions = self.calculate_positions()
+        self._triang = None
+        self.positions, self.strand_segs = self.calculate_positions()
         self.path = self.trace_path()
-    
-    def build_graph(self):
-        """构建扭结的图表示"""
-        G = nx.Graph()
         
-        # 添加所有弧段作为节点
-        all_arcs = set()
-        for cross in self.pd_code:
+        # 预先建立弧段到交叉点下标的映射，避免每次绘制时线性扫描
+        self.arc_to_index = {}
+        for i, cross in enumerate(self.pd_code):
             for arc in cross:
-                all_arcs.add(arc)
+                self.arc_to_index.setdefault(arc, i)
         
-        # 添加节点
-        G.add_nodes_from(all_arcs)
+        # 路径上每个弧段对应的交叉点下标
+        self.path_indices = np.fromiter((self.arc_to_index[arc] for arc in self.path),
+                                        dtype=np.intp, count=len(self.path))
         
-        # 添加边（连接关系）
-        for cross in self.pd_code:
-            # 在同一个交叉点内连接弧段
-            G.add_edge(cross[0], cross[1])
-            G.add_edge(cross[1], cross[2])
-            G.add_edge(cross[2], cross[3])
-            G.add_edge(cross[3], cross[0])
-            
-            # 添加交叉点之间的连接
-            G.add_edge(cross[0], cross[2])  # 对角连接
-            G.add_edge(cross[1], cross[3])  # 对角连接
-        
-        return G
+        # 绘制用的路径坐标只在构造时计算一次，draw中不再做几何计算
+        self.path_xy = self.positions[self.path_indices]
     
     def calculate_positions(self):
-        """计算交叉点的位置（圆形布局）"""
-        angles = np.linspace(0, 2 * np.pi, self.crossings, endpoint=False)
-        positions = []
-        for i, angle in enumerate(angles):
-            positions.append((np.cos(angle) * 1.5, np.sin(angle) * 1.5))
-        return positions
+        """计算交叉点的位置（圆形布局）及交叉处的线段"""
+        return _knot_geometry(self.crossings)
     
     def trace_path(self):
         """追踪扭结的完整路径"""
-        # 获取所有弧段
-        all_arcs = list(self.graph.nodes())
-        start_arc = all_arcs[0]
-        
-        # 深度优先搜索追踪路径
-        path = [start_arc]
-        visited = set([start_arc])
-        current = start_arc
-        
-        while True:
-            neighbors = list(self.graph.neighbors(current))
-            unvisited = [n for n in neighbors if n not in visited]
-            
-            if not unvisited:
-                break
-                
-            next_arc = unvisited[0]
-            path.append(next_arc)
-            visited.add(next_arc)
-            current = next_arc
+        # PD码中的弧段沿扭结依次编号，按编号排序即为遍历顺序
+        all_arcs = sorted({arc for cross in self.pd_code for arc in cross})
         
         # 使路径闭合
-        if path[0] in self.graph.neighbors(path[-1]):
-            path.append(path[0])
-        
-        return path
+        return all_arcs + [all_arcs[0]]
     
-    def get_arc_position(self, arc):
-        """获取弧段对应的交叉点位置"""
-        for i, cross in enumerate(self.pd_code):
-            if arc in cross:
-                return self.positions[i]
-        return None
+    def triangulation(self):
+        """获取交叉点的Delaunay三角剖分（首次调用时计算）"""
+        if self._triang is None:
+            self._triang = mtri.Triangulation(self.positions[:, 0], self.positions[:, 1])
+        return self._triang
     
     def draw(self, ax, title):
         """绘制完整的扭结曲线"""
@@ -92,57 +98,20 @@ class Knot:
         ax.axis('off')
         ax.set_title(f"{title}: {self.name}", fontsize=12)
         
-        # 绘制完整的扭结路径
-        points = []
-        for arc in self.path:
-            pos = self.get_arc_position(arc)
-            if pos:
-                points.append(pos)
+        # 使用Delaunay三角剖分创建平滑路径（交叉点不超过3个时只有一个三角形，跳过）
+        if self.crossings > 3:
+            ax.triplot(self.triangulation(), 'b-', lw=2, alpha=0.6)
         
-        if not points:
-            return
+        # 绘制完整的扭结路径
+        ax.plot(self.path_xy[:, 0], self.path_xy[:, 1], 'r-', lw=3, alpha=0.9)
         
-        # 转换为numpy数组
-        points = np.array(points)
+        # 绘制交叉处的上下关系
+        ax.add_collection(LineCollection(self.strand_segs, colors='k',
+                                         linewidths=2, zorder=5))
         
-        # 使用Delaunay三角剖分创建平滑路径
-        if len(points) > 3:
-            tri = Delaunay(points[:, :2])
-            edges = set()
-            for simplex in tri.simplices:
-                for i in range(3):
-                    edge = tuple(sorted([simplex[i], simplex[(i+1)%3]]))
-                    edges.add(edge)
-            
-            # 绘制所有边
-            for edge in edges:
-                p1 = points[edge[0]]
-                p2 = points[edge[1]]
-                ax.plot([p1[0], p2[0]], [p1[1], p2[1]], 'b-', lw=2, alpha=0.6)
-        
-        # 绘制主要路径
-        x = points[:, 0]
-        y = points[:, 1]
-        ax.plot(x, y, 'r-', lw=3, alpha=0.9)
-        
-        # 绘制交叉点并显示上下关系
-        for i, pos in enumerate(self.positions):
-            # 绘制交叉点
-            ax.plot(pos[0], pos[1], 'o', markersize=12, 
-                   markerfacecolor='white', markeredgecolor='black', zorder=10)
-            
-            # 绘制交叉关系：上方的线段（实线）
-            ax.plot([pos[0] - 0.1, pos[0] + 0.1], 
-                    [pos[1] - 0.1, pos[1] + 0.1], 
-                    'k-', lw=2, zorder=5)
-            
-            # 绘制下方的线段（断开）
-            ax.plot([pos[0] - 0.1, pos[0] - 0.03], 
-                    [pos[1] + 0.1, pos[1] + 0.03], 
-                    'k-', lw=2, zorder=5)
-            ax.plot([pos[0] + 0.03, pos[0] + 0.1], 
-                    [pos[1] - 0.03, pos[1] - 0.1], 
-                    'k-', lw=2, zorder=5)
+        # 绘制交叉点
+        ax.scatter(self.positions[:, 0], self.positions[:, 1], s=144,
+                   facecolor='white', edgecolor='black', zorder=10)
         
         # 设置图形范围
         ax.set_xlim(-2, 2)
@@ -172,31 +141,50 @@ KNOT_DEFINITIONS = {
               (37, 38, 39, 40)]
 }
 
+# 排除平凡结后的扭结类型
+_NONTRIVIAL_KNOT_TYPES = tuple(k for k in KNOT_DEFINITIONS if k != "Unknot")
+
+@functools.lru_cache(maxsize=None)
+def _get_knot(name):
+    """按名称构造扭结（结果缓存，扭结定义是固定的）"""
+    return Knot(name, KNOT_DEFINITIONS[name])
+
 def generate_knot_pair():
     """生成一对扭结（可能等价或不等价）"""
-    # 排除平凡结
-    knot_types = list(KNOT_DEFINITIONS.keys())
-    knot_types.remove("Unknot")
-    
     # 决定是否生成等价对
     equivalent = random.choice([True, False])
     
     if equivalent:
         # 选择一种扭结类型
-        knot_type = random.choice(knot_types)
-        knot1 = Knot(knot_type, KNOT_DEFINITIONS[knot_type])
+        knot_type = random.choice(_NONTRIVIAL_KNOT_TYPES)
+        knot1 = _get_knot(knot_type)
         
         # 创建等价的扭结（相同类型）
-        knot2 = Knot(knot_type, KNOT_DEFINITIONS[knot_type])
+        knot2 = _get_knot(knot_type)
     else:
         # 生成两个不同的扭结
-        knot_type1, knot_type2 = random.sample(knot_types, 2)
-        knot1 = Knot(knot_type1, KNOT_DEFINITIONS[knot_type1])
-        knot2 = Knot(knot_type2, KNOT_DEFINITIONS[knot_type2])
+        knot_type1, knot_type2 = random.sample(_NONTRIVIAL_KNOT_TYPES, 2)
+        knot1 = _get_knot(knot_type1)
+        knot2 = _get_knot(knot_type2)
     
     return knot1, knot2, equivalent
 
-def main():
+def _warmup():
+    """预先构造所有扭结并渲染一张临时图形，避免第一轮明显卡顿"""
+    for name in _NONTRIVIAL_KNOT_TYPES:
+        knot = _get_knot(name)
+        # 与draw一致：只有交叉点多于3个时才需要三角剖分
+        if knot.crossings > 3:
+            knot.triangulation()
+    
+    # 渲染交叉点最多的扭结，使三角剖分的绘制路径也被预热
+    largest = max(_NONTRIVIAL_KNOT_TYPES, key=lambda name: len(KNOT_DEFINITIONS[name]))
+    fig = Figure()
+    _get_knot(largest).draw(fig.add_subplot(), "扭结")
+    fig.savefig(io.BytesIO(), format="png")
+
+def main(batch=False):
+    """batch为True时使用Agg后端并将每轮图形保存为PNG，不弹出窗口"""
     print("扭结等价性判断练习")
     print("==================")
     print("规则：")
@@ -209,20 +197,40 @@ def main():
     
     score = 0
     total = 0
+    # 批处理模式下已保存的图形数，用于生成不重复的文件名
+    rounds = 0
+    
+    _warmup()
+    
+    if batch:
+        plt.switch_backend("Agg")
+    else:
+        plt.ion()
+    
+    # 创建图形（只创建一次，每轮复用）
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7))
     
     while True:
         try:
             knot1, knot2, equivalent = generate_knot_pair()
             
-            # 创建图形
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7))
+            # 窗口被关闭时重新创建图形
+            if not plt.fignum_exists(fig.number):
+                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7))
+            ax1.cla()
+            ax2.cla()
             
             # 绘制两个扭结
             knot1.draw(ax1, "扭结 A")
             knot2.draw(ax2, "扭结 B")
             
-            plt.tight_layout()
-            plt.show()
+            fig.tight_layout()
+            if batch:
+                fig.savefig(f"pair_{rounds}.png", dpi=100)
+                rounds += 1
+            else:
+                fig.canvas.draw_idle()
+                plt.pause(0.001)
             
             # 获取用户输入
             user_input = input("这两个扭结是否等价？ (y/n/q): ").strip().lower()
@@ -249,14 +257,17 @@ def main():
             
             total += 1
             print(f"当前得分: {score}/{total} ({score/total*100:.1f}%)\n")
+        except EOFError:
+            break
         except Exception as e:
             print(f"发生错误: {e}")
             print("重新生成扭结对...\n")
             continue
     
+    plt.close(fig)
     print("\n练习结束！")
     if total > 0:
         print(f"最终得分: {score}/{total} ({score/total*100:.1f}%)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(batch="--batch" in sys.argv[1:])
\ No newline at end of file